@@ -1,15 +1,30 @@
+import atexit
+import base64
+import gzip
 import json
-import urllib.request
-import urllib.parse
+import logging
 import os
 import random
-import uuid
+import socket
+import time
+import urllib.parse
 import boto3
+import threading
 import traceback
+import urllib3
+from botocore.config import Config
+from urllib3.connection import HTTPConnection
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone, timedelta
 
 import recommender  # ★ スコアリングエンジンを分離
 
+try:
+    import orjson  # CI が同梱する。無い環境 (Terraform 初回デプロイ等) では標準 json で動く
+except ImportError:
+    orjson = None
+
 # ==========================================
 # 環境変数
 # ==========================================
@@ -17,19 +32,171 @@ WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY')
 HOTPEPPER_API_KEY = os.environ.get('HOTPEPPER_API_KEY')
 TABLE_NAME = os.environ.get('LOG_TABLE_NAME', 'OtenkiMeshi_Log_TF')
 ALLOWED_ORIGIN = os.environ.get('ALLOWED_ORIGIN', '*')
-HTTP_TIMEOUT = 5
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': ALLOWED_ORIGIN,
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET'
+}
+# 分析ログのサンプリング率 (0.1 なら約10%だけ書く)。集計時は sample_weight で割り戻す。
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+# 外部APIが遅いときは早めに諦めて、既存のデフォルト値/フォールバックに回す
+# total は1回の試行あたりの上限 (接続が遅かった分だけ読み込みに使える時間を削る)
+HTTP_TIMEOUT = urllib3.Timeout(connect=1.0, read=2.0, total=2.5)
+# 再試行しても 5xx のままなら例外にせずレスポンスを返し、_get_json でステータスとして扱う
+HTTP_RETRIES = urllib3.Retry(
+    total=1, backoff_factor=0.1, status_forcelist=(502, 503, 504), raise_on_status=False,
+)
 DEFAULT_LAT = "35.690921"
 DEFAULT_LON = "139.700258"
 MAX_RECENT_KEYWORDS = 8
 MAX_SEARCH_KEYWORDS = 3
 MAX_RECENT_SHOPS = 30
+# フロントエンドが実際に使う項目だけ残す (HotPepper は1店舗あたり数十項目返す)。
+# ネストした項目もパスで指定し、使わない兄弟キー (photo.pc.l, urls 以外のURL等) は落とす。
+SHOP_FIELDS = (
+    ('id',), ('name',), ('address',), ('catch',),
+    ('photo', 'pc', 's'), ('urls', 'pc'), ('genre', 'name'), ('budget', 'name'),
+)
+SHOP_SEARCH_COUNT = 20
+JST = timezone(timedelta(hours=9))
+# 最終フォールバックの汎用ワード (index = 時)。深夜帯は recommender の t_dinner と揃えて居酒屋。
+FALLBACK_BY_HOUR = tuple(
+    ["居酒屋"] * 5 + ["カフェ"] * 6 + ["ランチ"] * 4 + ["カフェ"] * 2 + ["居酒屋"] * 7
+)
+DEFAULT_WEATHER = ("Clear", 20.0, 50)  # 天気APIが使えないときの値 (キャッシュしない)
+CLEAR_WEATHER_IDS = frozenset((800, 801))  # 快晴 / 晴れ (雲量11-25%) は Clear 扱い
+WEATHER_CACHE_TTL = 600   # 天気は10分程度では大きく変わらない
+WEATHER_CACHE_MAX = 256
+SHOPS_CACHE_TTL = 3600    # API障害時に「前回の結果」を返してよい期間
+SHOPS_CACHE_MAX = 128
+# 同じクエリ (座標 + recent) の再取得はブラウザに任せる。天気キャッシュと同じ寿命にそろえる。
+# recent はレスポンスごとに履歴へ積まれるので、「別の提案」を求める再検索はURLが変わる。
+# 天気がデフォルト値 / 店舗0件の応答には付けない (API 復旧後も失敗画面が残ってしまう)。
+SUCCESS_HEADERS = {
+    **CORS_HEADERS,
+    'Cache-Control': f'private, max-age={WEATHER_CACHE_TTL}',
+}
+GZIP_MIN_BYTES = 1024     # これより小さいレスポンスは圧縮しても得にならない
+LOG_BATCH_SIZE = 25       # BatchWriteItem の1回あたりの上限
+LOG_FLUSH_INTERVAL = 5    # 秒。これより古いバッファは次の書き込みで吐き出す
+LOG_BUFFER_MAX = LOG_BATCH_SIZE * 4  # 再送待ちを含めたバッファの上限
+
+# DynamoDB クライアントは最初のログ書き出し時に作る (コールドスタートの初期化を軽くする)。
+_ddb_client = None
+_ddb_lock = threading.Lock()
+
+# urllib3 は再試行時に WARNING でクエリ付きURL (APIキー入り) をログに出すので、CloudWatch に流さない
+logging.getLogger('urllib3').setLevel(logging.ERROR)
+
+# ウォームスタート間でコネクションを再利用し、TCP+TLSハンドシェイクを省く。
+# maxsize は並行検索 (_executor) が同じホストに同時に張る本数より大きくしておく。
+http = urllib3.PoolManager(
+    num_pools=4,
+    maxsize=10,
+    headers={'Connection': 'keep-alive'},
+    retries=HTTP_RETRIES,
+    # TCP_NODELAY (urllib3 既定) に加え、アイドル中のプール接続が切られにくいよう keepalive も有効にする
+    socket_options=HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ],
+)
+
+# 呼び出しごとに変わらないクエリは起動時に一度だけエンコードし、str.format のテンプレートにしておく。
+# lat/lon は _normalize_coord 済みの数値文字列なので、そのまま埋め込んでよい。
+# (エンコード済み部分の { } は %7B %7D になるので、format の置換対象と衝突しない)
+_WEATHER_URL = (
+    "https://api.openweathermap.org/data/2.5/weather?"
+    + urllib.parse.urlencode({'units': 'metric', 'appid': WEATHER_API_KEY or ''})
+    + "&lat={lat}&lon={lon}"
+)
+_HOTPEPPER_URL = (
+    "https://webservice.recruit.co.jp/hotpepper/gourmet/v1/?"
+    + urllib.parse.urlencode({
+        'key': HOTPEPPER_API_KEY or '', 'order': 4, 'count': SHOP_SEARCH_COUNT, 'format': 'json',
+    })
+    + "&lat={lat}&lng={lng}&range={range}&keyword={keyword}"
+)
+
+# (lat, lon を小数2桁 ≒ 1km メッシュに丸めたキー) -> (有効期限, (weather, temp, humidity))
+_weather_cache = {}
+# (メッシュ, keyword, range) -> (取得時刻, shops)。HotPepper 障害時の stale 応答用。
+_shops_cache = {}
+_cache_lock = threading.Lock()
+
+# ログ書き込みや投機的な検索をレスポンスと並行して走らせる (ウォームスタート間で再利用)。
+_executor = ThreadPoolExecutor(max_workers=4)
+
+# 初回呼び出し前に TLS ハンドシェイクを済ませ、接続をプールに入れておくホスト。
+PREWARM_URLS = (
+    "https://api.openweathermap.org/",
+    "https://webservice.recruit.co.jp/",
+)
+PREWARM_TIMEOUT = 1.0  # 秒。接続+応答の合計。遅いホストのために INIT を長引かせない
+
+
+def _prewarm(url):
+    try:
+        http.request('HEAD', url, timeout=urllib3.Timeout(total=PREWARM_TIMEOUT), retries=False)
+    except Exception as e:
+        print(f"Prewarm Error ({url}): {e}")
 
-try:
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(TABLE_NAME)
-except Exception as e:
-    print(f"DynamoDB Init Error: {e}")
-    table = None
+
+# INIT フェーズ中に並行して張り、終わるまで待つ (Lambda 上でのみ。テストやローカル import では通信しない)。
+# 待たずに import を返すと、初回呼び出しと競合して接続を二重に張り、ワーカーも塞いでしまう。
+if os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+    wait(
+        [_executor.submit(_prewarm, url) for url in PREWARM_URLS],
+        timeout=PREWARM_TIMEOUT + 0.5,
+    )
+
+
+def _json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_bytes(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode()
+
+
+def _accepts_gzip(event):
+    # HTTP API (v2) はヘッダー名を小文字で渡すが、REST API 経由も考えて大小無視で探す
+    for name, value in ((event or {}).get('headers') or {}).items():
+        if name.lower() == 'accept-encoding':
+            return 'gzip' in (value or '').lower()
+    return False
+
+
+def _build_response(status, headers, payload, event):
+    body = _json_bytes(payload)
+    if len(body) >= GZIP_MIN_BYTES and _accepts_gzip(event):
+        # レベル1でも圧縮率は十分で、CPU は既定(9)よりずっと軽い
+        return {
+            'statusCode': status,
+            'headers': {**headers, 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+            'body': base64.b64encode(gzip.compress(body, compresslevel=1)).decode(),
+            'isBase64Encoded': True,
+        }
+    return {
+        'statusCode': status,
+        'headers': headers,
+        'body': body.decode(),
+    }
+
+
+def _get_json(url):
+    # クエリにはAPIキーが含まれるので、エラーにはパスまでしか出さない
+    endpoint = url.split('?', 1)[0]
+    try:
+        res = http.request('GET', url, timeout=HTTP_TIMEOUT)
+    except urllib3.exceptions.HTTPError as e:
+        raise RuntimeError(f"{type(e).__name__} from {endpoint}") from None
+    if res.status != 200:
+        raise RuntimeError(f"HTTP {res.status} from {endpoint}")
+    return _json_loads(res.data)
 
 
 def _to_float(value):
@@ -50,11 +217,10 @@ def _normalize_coord(lat, lon):
 
 
 def _parse_recent(value):
-    allowed = {c["keyword"] for c in recommender.CANDIDATES}
     recent = []
     for keyword in (value or "").split(","):
         keyword = keyword.strip()
-        if keyword in allowed and keyword not in recent:
+        if keyword in recommender.CANDIDATE_BY_KEYWORD and keyword not in recent:
             recent.append(keyword)
         if len(recent) >= MAX_RECENT_KEYWORDS:
             break
@@ -74,34 +240,65 @@ def _parse_recent_shops(value):
     return set(shop_ids)
 
 
+def _grid_key(lat, lon):
+    return round(float(lat), 2), round(float(lon), 2)
+
+
+def _bounded_put(cache, key, entry, max_size):
+    # 並行検索 (_executor) から同時に書かれるので、追い出しまでをまとめてロックする
+    with _cache_lock:
+        cache.pop(key, None)
+        cache[key] = entry
+        if len(cache) > max_size:
+            # dict は挿入順なので、先頭が一番古いエントリ
+            cache.pop(next(iter(cache)))
+
+
 def get_weather_data(lat, lon):
+    key = _grid_key(lat, lon)
+    cached = _weather_cache.get(key)
+    if cached and time.time() < cached[0]:
+        return cached[1]
+
+    result = _fetch_weather(lat, lon)
+    if result is None:
+        return DEFAULT_WEATHER  # 失敗時のデフォルトはキャッシュしない
+
+    _bounded_put(_weather_cache, key, (time.time() + WEATHER_CACHE_TTL, result), WEATHER_CACHE_MAX)
+    return result
+
+
+def _fetch_weather(lat, lon):
     try:
         if not WEATHER_API_KEY:
             raise RuntimeError("WEATHER_API_KEY is not configured")
-        params = urllib.parse.urlencode({
-            'lat': lat, 'lon': lon, 'units': 'metric', 'appid': WEATHER_API_KEY,
-        })
-        url = f"https://api.openweathermap.org/data/2.5/weather?{params}"
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT) as res:
-            data = json.loads(res.read().decode())
-            weather_id = data['weather'][0]['id']
-            main_status = data['weather'][0]['main']
-            temp = data['main']['temp']
-            humidity = data['main']['humidity']
-            if weather_id == 800 or weather_id == 801:
-                return "Clear", temp, humidity
-            return main_status, temp, humidity
+        data = _get_json(_WEATHER_URL.format(lat=lat, lon=lon))
+        weather_id = data['weather'][0]['id']
+        main_status = data['weather'][0]['main']
+        temp = float(data['main']['temp'])  # 型変換はここ (API境界) で一度だけ
+        humidity = data['main']['humidity']
+        if weather_id in CLEAR_WEATHER_IDS:
+            return "Clear", temp, humidity
+        return main_status, temp, humidity
     except Exception as e:
         print(f"Weather API Error: {e}")
         traceback.print_exc()
-        return "Clear", 20.0, 50
+        return None
 
 
 def _shop_key(shop):
     return shop.get('id') or f"{shop.get('name', '')}:{shop.get('address', '')}"
 
 
+def _iter_shuffled(items):
+    """in-place の部分 Fisher-Yates。必要な件数だけ並べ替えたところで止められる。"""
+    n = len(items)
+    for i in range(n):
+        j = random.randrange(i, n)
+        items[i], items[j] = items[j], items[i]
+        yield items[i]
+
+
 def _merge_unique_shops(current, shops, limit=5, excluded_shop_keys=None):
     excluded_shop_keys = set(excluded_shop_keys or [])
     seen = {_shop_key(shop) for shop in current}
@@ -118,27 +315,58 @@ def _merge_unique_shops(current, shops, limit=5, excluded_shop_keys=None):
     return current
 
 
-def get_restaurants(lat, lon, keyword, search_range=3, count=20):
+def _project_shop(shop):
+    projected = {}
+    for path in SHOP_FIELDS:
+        value = shop
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return projected
+
+
+def get_restaurants(lat, lon, keyword, search_range=3):
+    cache_key = (*_grid_key(lat, lon), keyword, search_range)
     try:
         if not HOTPEPPER_API_KEY:
             raise RuntimeError("HOTPEPPER_API_KEY is not configured")
-        base_url = "https://webservice.recruit.co.jp/hotpepper/gourmet/v1/"
-        query_params = {
-            'key': HOTPEPPER_API_KEY, 'lat': lat, 'lng': lon, 'keyword': keyword,
-            'range': search_range, 'order': 4, 'count': count, 'format': 'json',
-        }
-        full_url = f"{base_url}?{urllib.parse.urlencode(query_params)}"
-        req = urllib.request.Request(full_url)
-        with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT) as res:
-            data = json.loads(res.read().decode())
-            if 'results' in data and 'shop' in data['results']:
-                return data['results']['shop']
+        data = _get_json(_HOTPEPPER_URL.format(
+            lat=lat, lng=lon, range=search_range, keyword=urllib.parse.quote(keyword),
+        ))
+        if 'results' not in data or 'shop' not in data['results']:
             return []
+        shops = [_project_shop(shop) for shop in data['results']['shop']]
     except Exception as e:
         print(f"HotPepper API Error: {e}")
         traceback.print_exc()
+        # 空の画面を返すより、少し古くても直近の成功結果を返す
+        cached = _shops_cache.get(cache_key)
+        if cached and time.time() - cached[0] < SHOPS_CACHE_TTL:
+            return list(cached[1])
         return []
 
+    # キャッシュ書き込みは API 呼び出しの try の外。取れた結果をキャッシュ側の失敗で捨てない
+    if shops:
+        try:
+            _bounded_put(_shops_cache, cache_key, (time.time(), tuple(shops)), SHOPS_CACHE_MAX)
+        except Exception as e:
+            print(f"Shops Cache Error: {e}")
+    return shops
+
+
+def _fetch_restaurants(lat, lon, keyword, search_range, prefetched=None):
+    """先行して投げた検索 ((keyword, range) -> Future) があればその結果を使う。"""
+    future = (prefetched or {}).get((keyword, search_range))
+    if future is not None:
+        return list(future.result())  # マージ時にシャッフルされるのでコピーを渡す
+    return get_restaurants(lat, lon, keyword, search_range)
+
 
 def get_restaurants_for_keywords(
     lat,
@@ -147,17 +375,17 @@ def get_restaurants_for_keywords(
     search_range=3,
     limit=5,
     excluded_shop_keys=None,
+    prefetched=None,
 ):
     shops = []
     matched_keyword = None
     for keyword in keywords[:MAX_SEARCH_KEYWORDS]:
-        found = get_restaurants(lat, lon, keyword, search_range)
+        found = _fetch_restaurants(lat, lon, keyword, search_range, prefetched)
         if found:
-            random.shuffle(found)
             before_count = len(shops)
             _merge_unique_shops(
                 shops,
-                found,
+                _iter_shuffled(found),
                 limit=limit,
                 excluded_shop_keys=excluded_shop_keys,
             )
@@ -168,7 +396,7 @@ def get_restaurants_for_keywords(
     return shops, matched_keyword
 
 
-def _apply_matched_keyword(rec, matched_keyword, keyword, msg, reason, logic_reason):
+def _apply_matched_keyword(matched_keyword, keyword, msg, reason, logic_reason):
     if not matched_keyword or matched_keyword == keyword:
         return keyword, msg, reason, logic_reason
 
@@ -184,31 +412,101 @@ def _apply_matched_keyword(rec, matched_keyword, keyword, msg, reason, logic_rea
     )
 
 
-def save_log_to_dynamodb(lat, lon, weather, temp, keyword, logic):
-    if table is None:
+LOG_FIELDS = (
+    'request_id', 'timestamp', 'location', 'weather', 'temp',
+    'recommended_keyword', 'logic_used', 'sample_weight',
+)
+# キーを埋めた雛形を copy() して使う (最初から必要なサイズの dict になる)
+_LOG_TEMPLATE = dict.fromkeys(LOG_FIELDS)
+
+# ログはまとめて BatchWriteItem で書く (1件ごとの往復を数十件で1回に償却する)。
+# 上限付き。溢れたら古いものから落ちる (フラッシュ待ちの間もメモリを食い潰さない)
+_log_buffer = deque(maxlen=LOG_BUFFER_MAX)
+_log_lock = threading.Lock()
+_last_flush = 0.0  # コンテナ最初のログはすぐ書き出す
+
+
+def _get_ddb():
+    global _ddb_client
+    with _ddb_lock:
+        if _ddb_client is None:
+            _ddb_client = boto3.client('dynamodb', config=Config(
+                tcp_keepalive=True,
+                # 再試行なしの1回だけ。失敗分はバッファに戻して次回のフラッシュで再送する
+                retries={'total_max_attempts': 1},
+            ))
+        return _ddb_client
+
+
+def save_log_to_dynamodb(lat, lon, weather, temp, keyword, logic, timestamp):
+    if random.random() >= LOG_SAMPLE_RATE:
+        return
+    values = (
+        os.urandom(16).hex(),  # 128bit の乱数 (uuid4 は122bit)。UUIDオブジェクトを作らない
+        timestamp,
+        f"{lat},{lon}",
+        weather,
+        str(temp),
+        keyword,
+        logic,
+        str(1.0 / LOG_SAMPLE_RATE),
+    )
+    item = _LOG_TEMPLATE.copy()
+    for key, value in zip(LOG_FIELDS, values):
+        item[key] = {'S': value}  # 全項目文字列なので属性値形式を直接組み立てる
+    with _log_lock:
+        _log_buffer.append(item)
+        due = (
+            len(_log_buffer) >= LOG_BATCH_SIZE
+            or time.time() - _last_flush > LOG_FLUSH_INTERVAL
+        )
+    if due:
+        # バッファへの追加までは同期で済ませ、ネットワーク往復だけを裏に回す
+        _executor.submit(flush_logs)
+
+
+def flush_logs():
+    global _last_flush
+    with _log_lock:
+        items = list(_log_buffer)
+        _log_buffer.clear()
+        _last_flush = time.time()
+    if not items:
         return
     try:
-        JST = timezone(timedelta(hours=9))
-        table.put_item(Item={
-            'request_id': str(uuid.uuid4()),
-            'timestamp': datetime.now(JST).isoformat(),
-            'location': f"{lat},{lon}",
-            'weather': weather,
-            'temp': str(temp),
-            'recommended_keyword': keyword,
-            'logic_used': logic
-        })
+        client = _get_ddb()
     except Exception as e:
-        print(f"DynamoDB Write Error: {e}")
+        print(f"DynamoDB Init Error: {e}")
+        return
+    for start in range(0, len(items), LOG_BATCH_SIZE):
+        batch = items[start:start + LOG_BATCH_SIZE]
+        try:
+            res = client.batch_write_item(RequestItems={
+                TABLE_NAME: [{'PutRequest': {'Item': item}} for item in batch],
+            })
+        except Exception as e:
+            print(f"DynamoDB Write Error: {e}")
+            _requeue_logs(batch)
+            continue
+        # スロットリング等で残った分は次回のフラッシュで再送する
+        unprocessed = res.get('UnprocessedItems', {}).get(TABLE_NAME, [])
+        if unprocessed:
+            _requeue_logs([r['PutRequest']['Item'] for r in unprocessed])
 
 
-def lambda_handler(event, context):
-    headers = {
-        'Access-Control-Allow-Origin': ALLOWED_ORIGIN,
-        'Access-Control-Allow-Headers': 'Content-Type',
-        'Access-Control-Allow-Methods': 'OPTIONS,GET'
-    }
+def _requeue_logs(items):
+    # 再送分を先頭に戻す。maxlen を超えた分は古いもの (先頭側) から捨てられる
+    with _log_lock:
+        pending = items + list(_log_buffer)
+        _log_buffer.clear()
+        _log_buffer.extend(pending)
 
+
+# コンテナ終了時に残りを書き出す (Lambda では呼ばれない場合もあるので best-effort)。
+atexit.register(flush_logs)
+
+
+def lambda_handler(event, context):
     try:
         params = event.get('queryStringParameters') or {}
         lat = params.get('lat')
@@ -219,11 +517,11 @@ def lambda_handler(event, context):
         recent = _parse_recent(params.get('recent'))
         recent_shops = _parse_recent_shops(params.get('recent_shops'))
 
-        weather, temp, humidity = get_weather_data(lat, lon)
-
-        JST = timezone(timedelta(hours=9))
         now = datetime.now(JST)
 
+        # 天気はクリティカルパスなので、ログ書き出し等と同じキューには並べずこのスレッドで取る
+        weather, temp, humidity = get_weather_data(lat, lon)
+
         # ★ レコメンドはエンジンに委譲。複数信号を合算したスコアで決まる。
         rec = recommender.recommend(
             temp=temp, humidity=humidity, weather=weather,
@@ -238,15 +536,23 @@ def lambda_handler(event, context):
 
         # --- 検索 + フォールバック ---
         search_keywords = rec.get("search_keywords") or [keyword]
+        generic = FALLBACK_BY_HOUR[now.hour]
+        prefetched = {}
+        if search_range < 3:
+            # [再試行1] 用の広域検索も先に投げておく (0件なら待たずに済む)
+            prefetched[(search_keywords[0], 3)] = _executor.submit(
+                get_restaurants, lat, lon, search_keywords[0], 3
+            )
         shops, matched_keyword = get_restaurants_for_keywords(
             lat,
             lon,
             search_keywords,
             search_range,
             excluded_shop_keys=recent_shops,
+            prefetched=prefetched,
         )
         keyword, msg, reason, logic_reason = _apply_matched_keyword(
-            rec, matched_keyword, keyword, msg, reason, logic_reason
+            matched_keyword, keyword, msg, reason, logic_reason
         )
 
         # [再試行1] 0件なら、まず半径を広げる
@@ -257,22 +563,32 @@ def lambda_handler(event, context):
                 search_keywords,
                 3,
                 excluded_shop_keys=recent_shops,
+                prefetched=prefetched,
             )
             logic_reason += " (range extended)"
             keyword, msg, reason, logic_reason = _apply_matched_keyword(
-                rec, matched_keyword, keyword, msg, reason, logic_reason
+                matched_keyword, keyword, msg, reason, logic_reason
             )
 
         # [再試行2] それでも0件なら、汎用ワードに逃げる前に
         #           「次に点数の高い候補」を順に試す (テーマを保ったままフォールバック)
         if not shops:
-            for alt in rec["ranked_candidates"][1:6]:
+            # 候補ごとの検索はまとめて並行に投げ、点数順に最初に見つかったものを採用する。
+            # ここまで来たら [最終] の汎用ワードも要りそうなので、同じ束で先に投げておく。
+            alts = rec["ranked_candidates"][1:6]
+            for alt_keyword in [alt["keyword"] for alt in alts] + [generic]:
+                if (alt_keyword, 5) not in prefetched:
+                    prefetched[(alt_keyword, 5)] = _executor.submit(
+                        get_restaurants, lat, lon, alt_keyword, 5
+                    )
+            for alt in alts:
                 shops, matched_keyword = get_restaurants_for_keywords(
                     lat,
                     lon,
                     [alt["keyword"]],
                     5,
                     excluded_shop_keys=recent_shops,
+                    prefetched=prefetched,
                 )
                 if shops:
                     keyword = alt["keyword"]
@@ -280,16 +596,20 @@ def lambda_handler(event, context):
                     reason = f"検索結果に合わせて「{keyword}」に切り替えました。"
                     logic_reason += f" (re-rank fallback: {keyword})"
                     break
+            if shops:
+                # 以降は prefetched を使わないので、まだ始まっていない検索は取り消す
+                for future in prefetched.values():
+                    future.cancel()
 
         # [最終] まだ0件なら時間帯ベースの汎用ワードで広域検索
         if not shops:
-            generic = "ランチ" if 11 <= now.hour < 15 else "カフェ" if now.hour < 17 else "居酒屋"
             shops, matched_keyword = get_restaurants_for_keywords(
                 lat,
                 lon,
                 [generic],
                 5,
                 excluded_shop_keys=recent_shops,
+                prefetched=prefetched,
             )
             keyword = generic
             msg = "近くにお店が見つからなかったので、周辺の人気スポットを探してきました！🏃"
@@ -298,34 +618,30 @@ def lambda_handler(event, context):
 
         # 除外しすぎて0件になった場合だけ、UX優先で最近見た店も許可する。
         if not shops and recent_shops:
-            shops, matched_keyword = get_restaurants_for_keywords(lat, lon, search_keywords, 5)
+            shops, matched_keyword = get_restaurants_for_keywords(
+                lat, lon, search_keywords, 5, prefetched=prefetched
+            )
             keyword, msg, reason, logic_reason = _apply_matched_keyword(
-                rec, matched_keyword, keyword, msg, reason, logic_reason
+                matched_keyword, keyword, msg, reason, logic_reason
             )
             logic_reason += " (recent shop exclusion relaxed)"
 
-        save_log_to_dynamodb(lat, lon, weather, temp, keyword, logic_reason)
+        # ログは分析用なので応答を待たせない (書き出しはバックグラウンドで best-effort)。
+        save_log_to_dynamodb(lat, lon, weather, temp, keyword, logic_reason, now.isoformat(timespec='seconds'))
 
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'weather': weather,
-                'temp': temp,
-                'humidity': humidity,
-                'message': msg,
-                'reason': reason,        # ★ "なぜこれ？" をフロントに渡す
-                'keyword': keyword,
-                'shops': shops,
-            }, ensure_ascii=False)
-        }
+        cacheable = bool(shops) and (weather, temp, humidity) != DEFAULT_WEATHER
+        return _build_response(200, SUCCESS_HEADERS if cacheable else CORS_HEADERS, {
+            'weather': weather,
+            'temp': temp,
+            'humidity': humidity,
+            'message': msg,
+            'reason': reason,        # ★ "なぜこれ？" をフロントに渡す
+            'keyword': keyword,
+            'shops': shops,
+        }, event)
 
     except Exception as e:
         print("************ CRITICAL ERROR ************")
         print(f"Error: {str(e)}")
         traceback.print_exc()
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': 'Internal Server Error'}, ensure_ascii=False)
-        }
+        return _build_response(500, CORS_HEADERS, {'error': 'Internal Server Error'}, event)
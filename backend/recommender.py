@@ -16,11 +16,19 @@ import json
 import math
 import os
 import random
+from bisect import bisect_left
+from itertools import accumulate
 
+try:
+    import orjson  # lambda_function と同じく、無ければ標準 json にフォールバック
+except ImportError:
+    orjson = None
 
-HOT_WEATHER = ("Clear",)
-WET_WEATHER = ("Rain", "Drizzle", "Thunderstorm", "Snow")
-CLOUDY_WEATHER = ("Clouds", "Mist", "Fog", "Haze")
+
+HOT_WEATHER = frozenset(("Clear",))
+WET_WEATHER = frozenset(("Rain", "Drizzle", "Thunderstorm", "Snow"))
+CLOUDY_WEATHER = frozenset(("Clouds", "Mist", "Fog", "Haze"))
+WEEKEND_DAYS = frozenset((5, 6))
 
 
 def _clamp(x, lo=0.0, hi=1.0):
@@ -31,8 +39,12 @@ CATALOG_PATH = os.path.join(os.path.dirname(__file__), "foods.json")
 
 
 def _load_candidates(path=CATALOG_PATH):
-    with open(path, encoding="utf-8") as f:
-        candidates = json.load(f)
+    if orjson is not None:
+        with open(path, "rb") as f:
+            candidates = orjson.loads(f.read())
+    else:
+        with open(path, encoding="utf-8") as f:
+            candidates = json.load(f)
 
     required = {"keyword", "msg", "category", "aff"}
     seen = set()
@@ -72,32 +84,30 @@ FEATURE_LABEL = {
 }
 
 
-def build_context_signals(temp, humidity, weather, hour, weekday):
-    """
-    現在の状況を「信号ベクトル」に変換する。
-    気温や湿度は連続値で効かせ、閾値での急変を避ける。
-    """
-    temp = float(temp)
-    humidity = float(humidity)
+def _weather_signals(weather):
+    """天気だけで決まる信号。"""
     sig = {}
-
-    # --- 気温 (連続) ---
-    sig["temp_cold"] = _clamp((12 - temp) / 12)        # 12℃以下で立ち上がり、0℃で最大
-    sig["temp_hot"] = _clamp((temp - 26) / 8)          # 26℃超で立ち上がり、34℃で最大
-    sig["temp_mild"] = _clamp(1 - abs(temp - 20) / 10) # 20℃付近で最大
-
-    # --- 天気 ---
     if weather in WET_WEATHER:
         sig["rainy"] = 1.0
     if weather == "Snow":
-        sig["temp_cold"] = max(sig.get("temp_cold", 0), 0.8)
+        sig["temp_cold"] = 0.8
     if weather in HOT_WEATHER:
         sig["sunny"] = 1.0
     if weather in CLOUDY_WEATHER:
         sig["cloudy"] = 1.0
+    return sig
 
-    # --- 湿度 ---
-    sig["humid"] = _clamp((humidity - 70) / 30)        # 70%超で立ち上がる
+
+# weather -> 信号。分類済みの天気ぶんだけインポート時に作る (未知の天気は信号なし)。
+WEATHER_SIGNALS = {
+    weather: _weather_signals(weather)
+    for weather in HOT_WEATHER | WET_WEATHER | CLOUDY_WEATHER
+}
+
+
+def _calendar_signals(hour, weekday):
+    """時間帯と曜日だけで決まる信号。天気に依存しないので事前計算できる。"""
+    sig = {}
 
     # --- 時間帯 (境界をあえて重ねて、単調さを減らす) ---
     if 5 <= hour <= 10:
@@ -116,8 +126,43 @@ def build_context_signals(temp, humidity, weather, hour, weekday):
         sig["d_friday_night"] = 1.0
     if weekday == 0 and 11 <= hour <= 14:
         sig["d_monday_lunch"] = 1.0
-    if weekday in (5, 6):
+    if weekday in WEEKEND_DAYS:
         sig["weekend"] = 1.0
+    return sig
+
+
+# (hour, weekday) -> 信号。24時間 × 7曜日 をインポート時に一度だけ作る。
+CALENDAR_SIGNALS = {
+    (hour, weekday): _calendar_signals(hour, weekday)
+    for hour in range(24)
+    for weekday in range(7)
+}
+
+
+def build_context_signals(temp, humidity, weather, hour, weekday):
+    """
+    現在の状況を「信号ベクトル」に変換する。
+    気温や湿度は連続値で効かせ、閾値での急変を避ける。
+    """
+    temp = float(temp)
+    humidity = float(humidity)
+    sig = {}
+
+    # --- 気温 (連続) ---
+    sig["temp_cold"] = _clamp((12 - temp) / 12)        # 12℃以下で立ち上がり、0℃で最大
+    sig["temp_hot"] = _clamp((temp - 26) / 8)          # 26℃超で立ち上がり、34℃で最大
+    sig["temp_mild"] = _clamp(1 - abs(temp - 20) / 10) # 20℃付近で最大
+
+    # --- 天気 (表引き1回。値は下限として効かせる: 雪なら冷え込みを最低0.8に) ---
+    for feat, floor in WEATHER_SIGNALS.get(weather, {}).items():
+        sig[feat] = max(sig.get(feat, 0), floor)
+
+    # --- 湿度 ---
+    sig["humid"] = _clamp((humidity - 70) / 30)        # 70%超で立ち上がる
+
+    # --- 時間帯・曜日 (起動時に計算済みの表を引くだけ) ---
+    calendar = CALENDAR_SIGNALS.get((hour, weekday))
+    sig.update(calendar if calendar is not None else _calendar_signals(hour, weekday))
 
     # 0の信号は捨てて軽くする
     return {k: v for k, v in sig.items() if v > 0}
@@ -203,14 +248,10 @@ def _softmax_pick(items, scores, tau=0.35):
     tau(温度)が小さいほど高得点に集中、大きいほばらつく。
     """
     mx = max(scores)
-    weights = [math.exp((s - mx) / tau) for s in scores]
-    r = random.random() * sum(weights)
-    acc = 0.0
-    for item, w in zip(items, weights):
-        acc += w
-        if r <= acc:
-            return item
-    return items[-1]
+    cum = list(accumulate(math.exp((s - mx) / tau) for s in scores))
+    # 乱数は1回だけ。累積和を二分探索して、r 以上になる最初の候補を選ぶ
+    i = bisect_left(cum, random.random() * cum[-1])
+    return items[min(i, len(items) - 1)]
 
 
 def recommend(temp, humidity, weather, hour, weekday, recent=None, top_k=8):
@@ -0,0 +1,448 @@
+import base64
+import gzip
+import io
+import json
+import logging
+import socket
+import sys
+import threading
+import unittest
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import urllib3
+
+import lambda_function
+
+
+def _response(payload, status=200):
+    res = MagicMock()
+    res.status = status
+    res.data = json.dumps(payload).encode()
+    return res
+
+
+WEATHER_PAYLOAD = {
+    "weather": [{"id": 500, "main": "Rain"}],
+    "main": {"temp": 14.5, "humidity": 80},
+}
+
+
+class WeatherCacheTest(unittest.TestCase):
+    def setUp(self):
+        lambda_function._weather_cache.clear()
+        patcher = patch.object(lambda_function, "WEATHER_API_KEY", "test-key")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nearby_coordinates_share_cached_weather(self):
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(WEATHER_PAYLOAD)
+        ) as request:
+            first = lambda_function.get_weather_data("35.690921", "139.700258")
+            second = lambda_function.get_weather_data("35.691500", "139.699800")
+
+        self.assertEqual(first, ("Rain", 14.5, 80))
+        self.assertTrue(
+            request.call_args.args[1].endswith("&lat=35.690921&lon=139.700258")
+        )
+        self.assertEqual(second, first)
+        self.assertEqual(request.call_count, 1)
+
+    def test_expired_entry_is_refetched(self):
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(WEATHER_PAYLOAD)
+        ) as request, patch.object(lambda_function.time, "time", return_value=1000.0):
+            lambda_function.get_weather_data("35.690921", "139.700258")
+
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(WEATHER_PAYLOAD)
+        ) as request, patch.object(
+            lambda_function.time,
+            "time",
+            return_value=1000.0 + lambda_function.WEATHER_CACHE_TTL + 1,
+        ):
+            lambda_function.get_weather_data("35.690921", "139.700258")
+
+        self.assertEqual(request.call_count, 1)
+
+    def test_api_failure_is_not_cached(self):
+        with patch.object(
+            lambda_function.http, "request", return_value=_response({}, status=500)
+        ):
+            result = lambda_function.get_weather_data("35.690921", "139.700258")
+
+        self.assertEqual(result, ("Clear", 20.0, 50))
+        self.assertEqual(lambda_function._weather_cache, {})
+
+    def test_timeout_falls_back_to_default_without_leaking_the_key(self):
+        error = urllib3.exceptions.ReadTimeoutError(
+            None, "https://api.openweathermap.org/data/2.5/weather?appid=test-key", "timed out"
+        )
+        with patch.object(
+            lambda_function.http, "request", side_effect=error
+        ), patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            result = lambda_function.get_weather_data("35.690921", "139.700258")
+
+        self.assertEqual(result, ("Clear", 20.0, 50))
+        self.assertIn("ReadTimeoutError", stdout.getvalue())
+        self.assertNotIn("test-key", stdout.getvalue())
+
+    def test_cache_size_is_bounded(self):
+        with patch.object(lambda_function, "WEATHER_CACHE_MAX", 2), patch.object(
+            lambda_function.http, "request", return_value=_response(WEATHER_PAYLOAD)
+        ):
+            for lat in ("35.10", "35.20", "35.30"):
+                lambda_function.get_weather_data(lat, "139.70")
+
+        self.assertEqual(
+            list(lambda_function._weather_cache),
+            [(35.2, 139.7), (35.3, 139.7)],
+        )
+
+
+class HttpLoggingTest(unittest.TestCase):
+    def test_retry_warnings_do_not_log_the_api_key(self):
+        # 接続を受けてすぐ切るサーバー。urllib3 は再試行し、通常なら URL 付きで警告を出す
+        server = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(server.close)
+
+        def drop_connections():
+            try:
+                while True:
+                    conn, _ = server.accept()
+                    conn.close()
+            except OSError:
+                pass  # テスト終了時に server が閉じられた
+
+        threading.Thread(target=drop_connections, daemon=True).start()
+        port = server.getsockname()[1]
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        root = logging.getLogger()
+        root.addHandler(handler)
+        self.addCleanup(root.removeHandler, handler)
+
+        with self.assertRaises(RuntimeError) as ctx:
+            lambda_function._get_json(f"http://127.0.0.1:{port}/weather?appid=SECRETKEY")
+
+        self.assertNotIn("SECRETKEY", str(ctx.exception))
+        self.assertEqual([r for r in records if "SECRETKEY" in r.getMessage()], [])
+
+class LogBatchTest(unittest.TestCase):
+    def setUp(self):
+        lambda_function._log_buffer.clear()
+        self.dynamodb = MagicMock()
+        self.dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+        patcher = patch.object(lambda_function, "_get_ddb", return_value=self.dynamodb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # バックグラウンドのフラッシュをその場で実行する
+        patcher = patch.object(
+            lambda_function._executor, "submit", side_effect=lambda fn, *args: fn(*args)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda_function._log_buffer.clear)
+
+    def _written(self):
+        return [
+            request
+            for call in self.dynamodb.batch_write_item.call_args_list
+            for request in call.kwargs["RequestItems"][lambda_function.TABLE_NAME]
+        ]
+
+    def _save(self):
+        lambda_function.save_log_to_dynamodb(
+            "35.0", "139.0", "Rain", 14.5, "ラーメン", "score", "2026-01-01T12:00:00+09:00"
+        )
+
+    def test_logs_are_buffered_until_batch_is_full(self):
+        with patch.object(lambda_function, "_last_flush", lambda_function.time.time()):
+            for _ in range(lambda_function.LOG_BATCH_SIZE - 1):
+                self._save()
+            self.dynamodb.batch_write_item.assert_not_called()
+
+            self._save()
+
+        self.assertEqual(self.dynamodb.batch_write_item.call_count, 1)
+        self.assertEqual(len(self._written()), lambda_function.LOG_BATCH_SIZE)
+        self.assertEqual(list(lambda_function._log_buffer), [])
+
+    def test_stale_buffer_is_flushed_on_next_write(self):
+        with patch.object(lambda_function, "_last_flush", 0.0):
+            self._save()
+
+        item = self._written()[0]["PutRequest"]["Item"]
+        self.assertEqual(item["recommended_keyword"], {"S": "ラーメン"})
+        self.assertEqual(item["temp"], {"S": "14.5"})
+
+    def test_sampled_out_logs_are_skipped(self):
+        with patch.object(lambda_function, "LOG_SAMPLE_RATE", 0.1), patch.object(
+            lambda_function.random, "random", return_value=0.5
+        ):
+            self._save()
+
+        self.assertEqual(list(lambda_function._log_buffer), [])
+        self.dynamodb.batch_write_item.assert_not_called()
+
+    def test_sampled_logs_carry_their_weight(self):
+        with patch.object(lambda_function, "LOG_SAMPLE_RATE", 0.1), patch.object(
+            lambda_function.random, "random", return_value=0.05
+        ), patch.object(lambda_function, "_last_flush", 0.0):
+            self._save()
+
+        item = self._written()[0]["PutRequest"]["Item"]
+        self.assertEqual(item["sample_weight"], {"S": "10.0"})
+
+    def test_unprocessed_items_are_requeued(self):
+        def partial_write(RequestItems):
+            return {"UnprocessedItems": {
+                lambda_function.TABLE_NAME: RequestItems[lambda_function.TABLE_NAME][:1],
+            }}
+
+        self.dynamodb.batch_write_item.side_effect = partial_write
+        with patch.object(lambda_function, "_last_flush", 0.0):
+            self._save()
+
+        self.assertEqual(len(lambda_function._log_buffer), 1)
+
+    def test_failed_batches_are_requeued_up_to_the_buffer_cap(self):
+        self.dynamodb.batch_write_item.side_effect = RuntimeError("throttled")
+        lambda_function._log_buffer.extend([{}] * (lambda_function.LOG_BUFFER_MAX + 5))
+
+        lambda_function.flush_logs()
+
+        self.assertEqual(len(lambda_function._log_buffer), lambda_function.LOG_BUFFER_MAX)
+
+
+class RestaurantSearchTest(unittest.TestCase):
+    def setUp(self):
+        lambda_function._shops_cache.clear()
+        patcher = patch.object(lambda_function, "HOTPEPPER_API_KEY", "test-key")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shops_are_projected_to_frontend_fields(self):
+        payload = {"results": {"shop": [{
+            "id": "J001",
+            "name": "店",
+            "address": "東京都",
+            "photo": {"pc": {"s": "s.jpg", "l": "l.jpg"}, "mobile": {"l": "m.jpg"}},
+            "urls": {"pc": "https://example.com"},
+            "genre": {"name": "ラーメン", "code": "G013"},
+            "catch": "",
+            "budget": {"name": "1000円", "code": "B001"},
+            "access": "新宿駅徒歩5分",
+            "coupon_urls": {"pc": "https://example.com/coupon"},
+        }]}}
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(payload)
+        ) as request:
+            shops = lambda_function.get_restaurants("35.0", "139.0", "ラーメン")
+
+        self.assertEqual(shops[0], {
+            "id": "J001",
+            "name": "店",
+            "address": "東京都",
+            "catch": "",
+            "photo": {"pc": {"s": "s.jpg"}},
+            "urls": {"pc": "https://example.com"},
+            "genre": {"name": "ラーメン"},
+            "budget": {"name": "1000円"},
+        })
+        url = request.call_args.args[1]
+        self.assertIn("count=20", url)
+        self.assertIn("keyword=%E3%83%A9%E3%83%BC%E3%83%A1%E3%83%B3", url)
+
+    def test_last_good_result_is_served_when_api_fails(self):
+        payload = {"results": {"shop": [{"id": "J001", "name": "店"}]}}
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(payload)
+        ):
+            fresh = lambda_function.get_restaurants("35.0", "139.0", "ラーメン", 2)
+        with patch.object(
+            lambda_function.http, "request", return_value=_response({}, status=503)
+        ):
+            stale = lambda_function.get_restaurants("35.001", "139.001", "ラーメン", 2)
+            other = lambda_function.get_restaurants("35.0", "139.0", "そば", 2)
+
+        self.assertEqual(stale, fresh)
+        self.assertEqual(other, [])
+
+    def test_expired_result_is_not_served(self):
+        payload = {"results": {"shop": [{"id": "J001", "name": "店"}]}}
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(payload)
+        ), patch.object(lambda_function.time, "time", return_value=1000.0):
+            lambda_function.get_restaurants("35.0", "139.0", "ラーメン")
+        with patch.object(
+            lambda_function.http, "request", return_value=_response({}, status=503)
+        ), patch.object(
+            lambda_function.time,
+            "time",
+            return_value=1000.0 + lambda_function.SHOPS_CACHE_TTL + 1,
+        ):
+            stale = lambda_function.get_restaurants("35.0", "139.0", "ラーメン")
+
+        self.assertEqual(stale, [])
+
+    def test_concurrent_searches_against_full_cache_keep_results(self):
+        for i in range(lambda_function.SHOPS_CACHE_MAX):
+            lambda_function._shops_cache[(0.0, 0.0, f"old{i}", 3)] = (0.0, ())
+        payload = {"results": {"shop": [{"id": "J001", "name": "店"}]}}
+        # スレッド切り替えを細かくして、追い出しの競合を起こしやすくする
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        with patch.object(
+            lambda_function.http, "request", return_value=_response(payload)
+        ), ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda i: lambda_function.get_restaurants("35.0", "139.0", f"kw{i}"),
+                range(2000),
+            ))
+
+        self.assertTrue(all(shops == [{"id": "J001", "name": "店"}] for shops in results))
+        self.assertEqual(len(lambda_function._shops_cache), lambda_function.SHOPS_CACHE_MAX)
+
+
+class ShopMergeTest(unittest.TestCase):
+    def test_merge_draws_only_as_many_shops_as_needed(self):
+        found = [{"id": f"J{i}"} for i in range(20)]
+        with patch.object(
+            lambda_function.random, "randrange", side_effect=lambda i, n: i
+        ) as randrange:
+            shops = lambda_function._merge_unique_shops(
+                [],
+                lambda_function._iter_shuffled(found),
+                limit=5,
+                excluded_shop_keys={"J1"},
+            )
+
+        self.assertEqual([s["id"] for s in shops], ["J0", "J2", "J3", "J4", "J5"])
+        self.assertEqual(randrange.call_count, 6)
+
+
+class HandlerTest(unittest.TestCase):
+    def setUp(self):
+        lambda_function._weather_cache.clear()
+        lambda_function._shops_cache.clear()
+        for name in ("WEATHER_API_KEY", "HOTPEPPER_API_KEY"):
+            patcher = patch.object(lambda_function, name, "test-key")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # ログのフラッシュはバックグラウンドで走るので、他のテストに漏れないよう差し替える
+        patcher = patch.object(lambda_function, "save_log_to_dynamodb")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # 水曜 12:00 (汎用フォールバックは「ランチ」)
+        clock = patch.object(lambda_function, "datetime", MagicMock(
+            now=MagicMock(return_value=datetime(2026, 1, 7, 12, 0, tzinfo=lambda_function.JST))
+        ))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.searches = []
+
+    def _fake_request(self, shops_by_keyword):
+        def request(method, url, timeout=None):
+            if "openweathermap" in url:
+                return _response(WEATHER_PAYLOAD)
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+            search = (query["keyword"][0], int(query["range"][0]))
+            self.searches.append(search)
+            shops = shops_by_keyword.get(search, shops_by_keyword.get(search[0], []))
+            return _response({"results": {"shop": shops}})
+        return request
+
+    def _fixed_recommendation(self, search_range=2):
+        ranked = [
+            {"keyword": kw, "category": kw, "msg": f"{kw}msg", "reason": "", "score": 1.0}
+            for kw in ("ラーメン", "うどん", "そば", "カレー", "定食", "餃子")
+        ]
+        return patch.object(lambda_function.recommender, "recommend", return_value={
+            "keyword": "ラーメン",
+            "msg": "ラーメンmsg",
+            "reason": "雨 から選びました。",
+            "search_range": search_range,
+            "search_keywords": ["ラーメン"],
+            "ranked_candidates": ranked,
+            "debug": {"top": []},
+        })
+
+    def _invoke(self, shops_by_keyword, headers=None):
+        with patch.object(
+            lambda_function.http, "request", side_effect=self._fake_request(shops_by_keyword)
+        ):
+            res = lambda_function.lambda_handler(
+                {
+                    "queryStringParameters": {"lat": "35.69", "lon": "139.70"},
+                    "headers": headers or {},
+                },
+                None,
+            )
+        body = res["body"]
+        if res.get("isBase64Encoded"):
+            body = gzip.decompress(base64.b64decode(body))
+        return res, json.loads(body)
+
+    def test_generic_search_is_not_sent_when_main_search_finds_shops(self):
+        with self._fixed_recommendation(search_range=3):
+            _, body = self._invoke({"ラーメン": [{"id": "J001", "name": "店"}]})
+
+        self.assertEqual(body["keyword"], "ラーメン")
+        self.assertEqual(self.searches, [("ラーメン", 3)])
+
+    def test_generic_search_is_searched_once_for_final_fallback(self):
+        res, body = self._invoke({"ランチ": [{"id": "J001", "name": "店"}]})
+
+        self.assertEqual(res["statusCode"], 200)
+        self.assertEqual(res["headers"]["Cache-Control"], "private, max-age=600")
+        self.assertEqual(body["keyword"], "ランチ")
+        self.assertEqual([s["id"] for s in body["shops"]], ["J001"])
+        self.assertEqual(self.searches.count(("ランチ", 5)), 1)
+
+    def test_degraded_responses_are_not_cacheable(self):
+        no_shops_res, no_shops = self._invoke({})
+        lambda_function._weather_cache.clear()
+        with patch.object(lambda_function, "WEATHER_API_KEY", None):
+            default_weather_res, _ = self._invoke({"ランチ": [{"id": "J001", "name": "店"}]})
+
+        self.assertEqual(no_shops["shops"], [])
+        self.assertNotIn("Cache-Control", no_shops_res["headers"])
+        self.assertNotIn("Cache-Control", default_weather_res["headers"])
+
+    def test_large_body_is_gzipped_when_client_accepts_it(self):
+        shops = [{"id": f"J{i:03d}", "name": "店" * 100} for i in range(5)]
+        plain_res, plain = self._invoke({"ランチ": shops})
+        res, body = self._invoke({"ランチ": shops}, headers={"accept-encoding": "gzip, br"})
+
+        self.assertNotIn("Content-Encoding", plain_res["headers"])
+        self.assertEqual(res["headers"]["Content-Encoding"], "gzip")
+        self.assertTrue(res["isBase64Encoded"])
+        self.assertEqual(body["keyword"], plain["keyword"])
+        self.assertEqual(len(body["shops"]), 5)
+
+    def test_extended_range_search_is_prefetched(self):
+        with self._fixed_recommendation(search_range=2):
+            _, body = self._invoke({("ラーメン", 3): [{"id": "J010", "name": "店"}]})
+
+        self.assertEqual(body["keyword"], "ラーメン")
+        self.assertEqual(self.searches.count(("ラーメン", 3)), 1)
+
+    def test_rerank_fallback_keeps_rank_order_when_searched_in_parallel(self):
+        with self._fixed_recommendation(search_range=3):
+            _, body = self._invoke({
+                ("そば", 5): [{"id": "J020", "name": "そば屋"}],
+                ("定食", 5): [{"id": "J030", "name": "定食屋"}],
+            })
+
+        self.assertEqual(body["keyword"], "そば")
+        self.assertEqual([s["id"] for s in body["shops"]], ["J020"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,28 @@ class RecommenderTest(unittest.TestCase):
         self.assertGreaterEqual(len(recommender.CANDIDATES), 60)
         self.assertTrue(all("category" in c for c in recommender.CANDIDATES))
 
+    def test_calendar_signals_are_precomputed_for_every_hour_and_weekday(self):
+        self.assertEqual(len(recommender.CALENDAR_SIGNALS), 24 * 7)
+        sig = recommender.build_context_signals(
+            temp=20, humidity=50, weather="Clouds", hour=19, weekday=4
+        )
+
+        self.assertEqual(sig["t_dinner"], 1.0)
+        self.assertEqual(sig["d_friday_night"], 1.0)
+        self.assertNotIn("weekend", sig)
+
+    def test_snow_only_raises_cold_signal_to_its_floor(self):
+        mild = recommender.build_context_signals(
+            temp=20, humidity=50, weather="Snow", hour=12, weekday=2
+        )
+        freezing = recommender.build_context_signals(
+            temp=-5, humidity=50, weather="Snow", hour=12, weekday=2
+        )
+
+        self.assertEqual(mild["temp_cold"], 0.8)
+        self.assertEqual(freezing["temp_cold"], 1.0)
+        self.assertEqual(freezing["rainy"], 1.0)
+
     def test_hot_humid_lunch_prefers_refreshing_keywords(self):
         with patch("recommender.random.random", return_value=0):
             result = recommender.recommend(
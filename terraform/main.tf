@@ -61,7 +61,7 @@ resource "aws_iam_role_policy" "lambda_dynamodb_policy" {
     Statement = [
       {
         Effect   = "Allow"
-        Action   = ["dynamodb:PutItem"]
+        Action   = ["dynamodb:PutItem", "dynamodb:BatchWriteItem"]
         Resource = aws_dynamodb_table.otenki_log.arn
       }
     ]
@@ -112,6 +112,7 @@ resource "aws_lambda_function" "backend" {
       WEATHER_API_KEY   = var.weather_api_key
       HOTPEPPER_API_KEY = var.hotpepper_api_key
       LOG_TABLE_NAME    = aws_dynamodb_table.otenki_log.name
+      LOG_SAMPLE_RATE   = "1.0"
     }
   }
 